@@ -1,6 +1,5 @@
 import mesa
 import numpy as np
-import random
 
 
 class House(mesa.Agent):
@@ -19,17 +18,22 @@ class House(mesa.Agent):
             locational_quality: A numeric value representing the initial neighborhood quality.
         """
         super().__init__(unique_id, model)
-        self.locational_quality = locational_quality
+        self.initial_locational_quality = locational_quality
+
+    @property
+    def locational_quality(self):
+        # Live view into the model's quality grid; houses no longer copy
+        # the value back each step
+        if self.pos is None:
+            return self.initial_locational_quality
+        return float(self.model.locational_quality_grid[self.pos])
 
     def step(self):
         """
-        Updates locational quality based on the average income of neighboring households.
+        Locational quality is recomputed for the whole grid by the model's
+        batched update, so individual houses have no per-step work left.
         """
-        # Step 1: House agent updates locational quality based on the incomes of neighboring households.
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=1)
-        incomes = [agent.income for agent in neighbors if isinstance(agent, Resident)]
-        if incomes:
-            self.locational_quality = np.mean(incomes)
+        pass
 
 
 class Resident(mesa.Agent):
@@ -38,6 +42,9 @@ class Resident(mesa.Agent):
     locational quality and income.
     """
 
+    # Class-level group tag, cheaper than isinstance checks in hot paths
+    is_immigrant = False
+
     def __init__(self, unique_id, model, happiness_threshold, income):
         """
         Initialize a Resident agent with socioeconomic characteristics and a happiness threshold.
@@ -49,21 +56,59 @@ class Resident(mesa.Agent):
             income: Annual income of the resident, influencing their economic decisions.
         """
         super().__init__(unique_id, model)
-        self.happiness_threshold = happiness_threshold
-        self.income = income
-        self.last_utility = 0
+        # Numeric state lives in the model's structure-of-arrays columns;
+        # the agent only keeps its slot index into them
+        self._slot = model.register_resident(self)
+        model.res_threshold[self._slot] = happiness_threshold
+        model.res_income[self._slot] = income
         self.failed_move_attempts = 0  # Track failed move attempts
         self.moved_this_step = False  # Track if the agent moved in the current step
-        self.is_unhappy = False
-        self.utility = 0  # Track utility
+        # Constant per agent; hoisted out of the house-search fallback
+        self.fallback_quality_cutoff = 0.8 * income
+
+    @property
+    def income(self):
+        return float(self.model.res_income[self._slot])
+
+    @property
+    def happiness_threshold(self):
+        return float(self.model.res_threshold[self._slot])
+
+    @happiness_threshold.setter
+    def happiness_threshold(self, value):
+        self.model.res_threshold[self._slot] = value
+
+    @property
+    def utility(self):
+        return float(self.model.res_utility[self._slot])
+
+    @utility.setter
+    def utility(self, value):
+        self.model.res_utility[self._slot] = value
+
+    @property
+    def last_utility(self):
+        return float(self.model.res_last_utility[self._slot])
+
+    @last_utility.setter
+    def last_utility(self, value):
+        self.model.res_last_utility[self._slot] = value
+
+    @property
+    def is_unhappy(self):
+        return bool(self.model.res_unhappy[self._slot])
+
+    @is_unhappy.setter
+    def is_unhappy(self, value):
+        self.model.res_unhappy[self._slot] = value
 
     def step(self):
         """
         Perform actions during a simulation step.
         """
-        # Step 2: Resident evaluates utility based on locational quality and decides whether to stay or move.
+        # Step 2: the model batch-computed this resident's utility already;
+        # decide whether to stay or move, re-evaluating after a move
         self.moved_this_step = False
-        self.calculate_utilities()
         self.decide_to_move()
         if self.moved_this_step:
             self.calculate_utilities()
@@ -73,57 +118,61 @@ class Resident(mesa.Agent):
         Calculates the utility of the resident based on locational quality and 
         income.
         """
-        house = self.model.grid.get_cell_list_contents([self.pos])[0]
-        locational_quality = house.locational_quality
-        
-        # Find the maximum locational quality in the grid
-        max_locational_quality = max(h.locational_quality for h in self.model.schedule.agents if isinstance(h, House))
+        # There is exactly one house per cell, so its quality can be read
+        # straight from the model's grid mirror
+        locational_quality = self.model.locational_quality_grid[self.pos]
+        self.model.res_cur_quality[self._slot] = locational_quality
+
+        # Maximum locational quality in the grid, cached by the model when
+        # the house phase runs (qualities do not change mid-step)
+        max_locational_quality = self.model.max_locational_quality
 
         # Scale locational quality between 0 and 1
         capped_quality = locational_quality / max_locational_quality if max_locational_quality > 0 else 0
         
-        # Define in-group criteria based on class
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=1)
-        if isinstance(self, Immigrant):
-            in_group_neighbors = [agent for agent in neighbors if isinstance(agent, Immigrant)]
+        # Define in-group criteria based on class, read from the per-type
+        # neighbor-count grids instead of a get_neighbors/isinstance loop
+        resident_neighbors = int(self.model.resident_neighbor_grid[self.pos])
+        immigrant_neighbors = int(self.model.immigrant_neighbor_grid[self.pos])
+        if self.is_immigrant:
+            in_group_count = immigrant_neighbors
         else:
-            in_group_neighbors = [agent for agent in neighbors if isinstance(agent, Resident) and not isinstance(agent, Immigrant)]
-        
-        # Calculate the influence of in-group neighbors
-        in_group_influence = len(in_group_neighbors) / len(neighbors) if neighbors else 0
+            in_group_count = resident_neighbors
+
+        # Calculate the influence of in-group neighbors; every neighboring
+        # cell also holds one static agent (house or slum)
+        total_neighbors = 8 + resident_neighbors + immigrant_neighbors
+        in_group_influence = in_group_count / total_neighbors if total_neighbors else 0
 
         # Adjust utility calculation to include in-group influence
         #if isinstance(self, Immigrant):
             #self.utility = (self.model.preference * capped_quality) + ((1 - self.model.preference) * in_group_influence) 
         #else:
-        self.utility = (self.model.preference * capped_quality) + ((1 - self.model.preference) * in_group_influence) 
-        print(f"Agent {self.unique_id} at {self.pos} has utility {self.utility}")
-        self.update_happiness(self.utility)
-
-    def update_happiness_status(self):
-        self.is_unhappy = self.last_utility < self.happiness_threshold
+        self.utility = (self.model.preference * capped_quality) + (self.model.one_minus_preference * in_group_influence)
 
     def decide_to_move(self):
         """
         Decide whether to move based on current utility compared to happiness threshold.
         If the current utility is less than the happiness threshold, attempt to move to a better location.
         """
-        house = self.model.grid.get_cell_list_contents([self.pos])[0]
-        locational_quality = house.locational_quality
-        
+        # Reuse the quality cached when this agent's utility was evaluated
+        locational_quality = self.model.res_cur_quality[self._slot]
+
         # Step 3: If unhappy, residents are queued for a move sorted by income
         # Move if the locational quality is below income
         if locational_quality < self.income:
             new_position = self.find_new_house()
             if new_position:
+                # The grid keeps the model's array mirrors in sync on moves
                 self.model.grid.move_agent(self, new_position)
                 self.moved_this_step = True
                 self.failed_move_attempts = 0
-                self.is_unhappy = False
             else:
                 self.failed_move_attempts += 1
-                if isinstance(self, Immigrant) and self.failed_move_attempts >= 4:
+                if self.is_immigrant and self.failed_move_attempts >= 4:
                     self.convert_to_slum()
+            # One write covers both branches; the success branch used to set
+            # False only for it to be overwritten here
             self.is_unhappy = True
         else:
             self.moved_this_step = False
@@ -132,65 +181,68 @@ class Resident(mesa.Agent):
     def find_new_house(self):
         """
         Find the best house to move to on the entire grid, based on higher locational quality.
+        The scan is a single vectorized pass over the model's locational-quality grid instead
+        of a Python loop over every cell.
         """
-        best_position = None
-        best_quality = -float('inf')
-        income_factor = self.income / 40000
-        quality_threshold = self.income
+        quality = self.model.locational_quality_grid
+        # The jitter scale is income times a fixed 10%; folding it into the
+        # draw bounds removes a multiply per candidate
+        jitter_bound = 0.1 * self.income
 
-        potential_positions = []
-        
-        for x in range(self.model.grid.width):
-            for y in range(self.model.grid.height):
-                pos = (x, y)
-                cell_contents = self.model.grid.get_cell_list_contents(pos)
-                house = next((agent for agent in cell_contents if isinstance(agent, House)), None)
-                has_resident = any(isinstance(agent, Resident) for agent in cell_contents)
-                
-                if house and not has_resident:
-                    # Add a small randomness to the quality check to avoid clustering
-                    random_quality = house.locational_quality + np.random.uniform(-0.1, 0.1) * quality_threshold
-                    if house.locational_quality > best_quality and random_quality < self.income:
-                        best_quality = house.locational_quality
-                        best_position = pos
-
-                    # Collect potential positions based on some quality threshold
-                    if house.locational_quality >= quality_threshold * 0.8:  # A threshold to collect houses of interest
-                        potential_positions.append(pos)
-
-        # If no best position is found, choose from the potential positions
-        if not best_position and potential_positions:
-            best_position = random.choice(potential_positions)
-            
-        return best_position
-
-    def update_happiness(self, total_utility):
-        """
-        Adjust happiness threshold based on the last utility.
-        Positive change increases happiness threshold, negative change decreases it.
-        """
-        if total_utility > self.last_utility:
-            self.happiness_threshold += 0.15 * (1 - self.happiness_threshold)
-        elif total_utility < self.last_utility:
-            self.happiness_threshold -= 0.15 * (1 - self.happiness_threshold)
-        self.last_utility = total_utility
-        self.update_happiness_status()
+        # First try the per-step cache of best vacant houses; entries claimed
+        # by earlier movers are skipped via the occupancy mask
+        height = self.model.height
+        for flat_index in self.model.move_queue:
+            x, y = divmod(flat_index, height)
+            if self.model.occupied_mask[x, y] or not self.model.house_mask[x, y]:
+                continue
+            random_quality = quality[x, y] + self.model.rng.uniform(-jitter_bound, jitter_bound)
+            if random_quality < self.income:
+                return (x, y)
+
+        # Score only the currently vacant houses, via the model's cached
+        # array view of the vacancy index
+        vacant, xs, ys = self.model.vacant_candidate_arrays()
+        if not vacant:
+            return None
+        qualities = quality[xs, ys]
+
+        # Add a small randomness to the quality check to avoid clustering
+        jitter = self.model.rng.uniform(-jitter_bound, jitter_bound, size=qualities.size)
+        eligible = (qualities + jitter) < self.income
+        if eligible.any():
+            best = np.argmax(np.where(eligible, qualities, -np.inf))
+            return (int(xs[best]), int(ys[best]))
+
+        # If no best position is found, choose from houses above some quality
+        # threshold, drawn from the model's seeded RNG so a run stays
+        # reproducible from its seed
+        potential = np.flatnonzero(qualities >= self.fallback_quality_cutoff)
+        if potential.size:
+            pick = int(potential[self.model.random.randrange(potential.size)])
+            return vacant[pick]
+
+        return None
 
     def convert_to_slum(self):
-        # Remove the House agent at the current position
-        cell_contents = self.model.grid.get_cell_list_contents([self.pos])
-        house = next((agent for agent in cell_contents if isinstance(agent, House)), None)
+        # Remove the House agent at the current position; one dict lookup
+        # instead of listing and filtering the cell contents
+        house = self.model.house_by_pos.get(self.pos)
         if house:
             self.model.schedule.remove(house)
             self.model.grid.remove_agent(house)
-        
+
         # Convert current cell to an urban slum
         slum = UrbanSlum(self.model, self.pos, self.model.next_id())
         self.model.grid.place_agent(slum, self.pos)
+        self.model.slums.append(slum)
         self.model.slum_count += 1
 
-        # Remove the current agent from the schedule
+        # Remove the current agent from the schedule (which also drops it
+        # from the typed registries) and release its structure-of-arrays slot
         self.model.schedule.remove(self)
+        self.model.res_active[self._slot] = False
+        self.model.resident_by_slot[self._slot] = None
 
 class UrbanSlum(mesa.Agent):
     """
@@ -202,6 +254,8 @@ class UrbanSlum(mesa.Agent):
         self.locational_quality = 0  # [TBD] Slums might have minimum locational quality
 
 class Immigrant(Resident):
+    is_immigrant = True
+
     def __init__(self, unique_id, model, happiness_threshold, income):
         super().__init__(unique_id, model, happiness_threshold, income)
         self.moved_this_step = False
@@ -210,6 +264,4 @@ class Immigrant(Resident):
         """
         Custom step behavior for immigrants, if different from residents.
         """
-        self.calculate_utilities()
-        self.decide_to_move()
-        self.update_happiness_status()
\ No newline at end of file
+        self.decide_to_move()
\ No newline at end of file
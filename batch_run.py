@@ -1,6 +1,7 @@
 from model import Gentrification
 from mesa import batch_run
 import numpy as np
+import os
 import pandas as pd
 
 # NOTE: You do not need this as a separate file BUT it can be nice to track
@@ -20,14 +21,17 @@ parameters = {"height": 20,
 # what to run and what to collect
 # iterations is how many runs per parameter value
 # max_steps is how long to run the model
-results = batch_run(Gentrification, 
-                    parameters,
-                    iterations=20,  
-                    max_steps=300, 
-                    data_collection_period=20) #how often do you want to pull the data
+# The __main__ guard is required for multiprocessing: worker processes
+# re-import this module and must not kick off their own sweep
+if __name__ == "__main__":
+    results = batch_run(Gentrification,
+                        parameters,
+                        iterations=20,
+                        max_steps=300,
+                        data_collection_period=20,  #how often do you want to pull the data
+                        number_processes=os.cpu_count())  #one worker per core
 
-
-## NOTE: to do data collection, you need to be sure your pathway is correct to save this!
-# Data collection
-# extract data as a pandas Data Frame
-pd.DataFrame(results).to_csv("batch_data.csv")
\ No newline at end of file
+    ## NOTE: to do data collection, you need to be sure your pathway is correct to save this!
+    # Data collection
+    # extract data as a pandas Data Frame
+    pd.DataFrame(results).to_csv("batch_data.csv")
\ No newline at end of file
@@ -3,10 +3,26 @@ import numpy as np
 from agents import Resident, House, Immigrant, UrbanSlum
 from mesa.datacollection import DataCollector
 
+# The 8 Moore-neighborhood offsets, shared by every rolled-sum stencil and
+# incremental neighbor-count update below
+MOORE_OFFSETS = tuple((dx, dy)
+                      for dx in (-1, 0, 1)
+                      for dy in (-1, 0, 1)
+                      if (dx, dy) != (0, 0))
+
+
 class Gentrification(mesa.Model):
     def __init__(self, width, height, density, immigrant_start, immigrant_count=50, income_variance=0.25, preference=0.5):
         super().__init__()
-        self.grid = mesa.space.MultiGrid(width, height, True)
+        # Cache the grid dimensions; they are fixed for the lifetime of a
+        # run and cheaper to read than the grid attribute chain
+        self.width = width
+        self.height = height
+        # Model-owned NumPy generator, seeded from Mesa's stdlib RNG so array
+        # draws are reproducible per model seed instead of sharing the global
+        # np.random state across batch workers
+        self.rng = np.random.default_rng(self.random.getrandbits(128))
+        self.grid = GentrificationGrid(width, height, True, self)
         self.schedule = CustomScheduler(self)
         self.immigrant_start = immigrant_start
         self.current_step = 0  # Track the current timestep
@@ -14,10 +30,60 @@ class Gentrification(mesa.Model):
         self.immigrants_added = 0  # Counter for added immigrants
         self.income_variance = income_variance
         self.preference = preference  # Add preference as an attribute of the model
+        self.one_minus_preference = 1 - preference  # Hoisted out of the utility math
         self.slum_count = 0 # Counter for urban slums
+
+        # NumPy mirrors of the grid state so hot loops in agents.py can use
+        # vectorized lookups instead of scanning every cell through Mesa
+        self.locational_quality_grid = np.zeros((width, height))
+        self.house_mask = np.zeros((width, height), dtype=bool)  # True where a House stands
+        self.occupied_mask = np.zeros((width, height), dtype=bool)  # True where a Resident lives
+        self.income_grid = np.zeros((width, height))  # Income of the resident in each cell
+        self.resident_count_grid = np.zeros((width, height), dtype=np.int16)
+        self.immigrant_count_grid = np.zeros((width, height), dtype=np.int16)
+        # Number of residents/immigrants in the 8 surrounding cells, used by
+        # the homophily term in Resident.calculate_utilities
+        self.resident_neighbor_grid = np.zeros((width, height), dtype=np.int16)
+        self.immigrant_neighbor_grid = np.zeros((width, height), dtype=np.int16)
+        # Torus-wrapped coordinates of the 8 Moore neighbors of every cell,
+        # precomputed once so incremental count updates index straight into
+        # the grids instead of redoing the modulo wrap per move
+        self._moore_xi = np.empty((width, height, 8), dtype=np.intp)
+        self._moore_yi = np.empty((width, height, 8), dtype=np.intp)
+        for i, (dx, dy) in enumerate(MOORE_OFFSETS):
+            self._moore_xi[:, :, i] = (np.arange(width)[:, None] + dx) % width
+            self._moore_yi[:, :, i] = (np.arange(height)[None, :] + dy) % height
+        self.move_queue = []  # Per-step cache of the best vacant houses (flat indices)
+        self.max_locational_quality = 0.0  # Refreshed once per step with the house phase
+        self.vacant_house_positions = set()  # Cells with a house but no resident
+        self._vacant_arrays = None  # Lazily built array view of the vacancy index
+        self.house_by_pos = {}  # Direct pos -> House lookup (no entry on slum cells)
+        # Row-standardized Moore weights depend only on grid geometry; on a
+        # torus every cell has 8 neighbors at weight 1/8, so each cell's
+        # total is exactly 1. Built once instead of per datacollector call.
+        self._weights_matrix = np.ones((height, width))
+        # Moran's I only changes when grid contents do; the grid hooks mark
+        # it dirty and quiescent steps reuse the cached statistic
+        self._morans_i_cache = 0.0
+        self._morans_i_dirty = True
+
+        # Typed registries mirroring schedule membership, maintained by
+        # CustomScheduler.add/remove so reporters and the scheduler iterate
+        # the agents they want directly instead of isinstance-filtering the
+        # full agent list each call. Residents includes immigrants, matching
+        # the isinstance(agent, Resident) checks they replace; slums are
+        # never scheduled and are registered on conversion instead.
+        self.houses = []
+        self.residents = []
+        self.immigrants = []
+        self.slums = []
+
+        # Population statistics are computed once per step in
+        # _recompute_stats; each reporter just reads its entry
+        self._stats = {}
         self.datacollector = DataCollector(
             model_reporters={
-                "Average Income": lambda m: np.mean([a.income for a in m.schedule.agents if isinstance(a, Resident)]),
+                "Average Income": self.get_average_income,
                 "Urban Slums": self.count_urban_slums,
                 "Unhappy Residents": self.get_unhappy_agents,
                 "Unhappy Immigrant": self.get_unhappy_immigrant,
@@ -30,45 +96,72 @@ class Gentrification(mesa.Model):
         total_cells = width * height
         num_agents = int(total_cells * density)
 
-        # Step 0a: Initialize houses on every grid
+        # Draw every income/threshold up front in four vector calls instead
+        # of one scalar RNG dispatch per agent; the placement and
+        # add_immigrants loops just index into these
+        resident_income_mean = 30000 + (self.income_variance * 15000)
+        immigrant_income_mean = 30000 - (self.income_variance * 15000)
+        self._resident_incomes = self.rng.lognormal(
+            mean=np.log(resident_income_mean), sigma=0.25, size=num_agents)
+        self._resident_thresholds = self.rng.beta(
+            a=2.5, b=2.5, size=num_agents) * 0.2 + 0.3
+        self._immigrant_incomes = self.rng.lognormal(
+            mean=np.log(immigrant_income_mean), sigma=0.25, size=immigrant_count)
+        self._immigrant_thresholds = self.rng.beta(
+            a=2.0, b=3.0, size=immigrant_count) * 0.2 + 0.3
+
+        # Structure-of-arrays storage for dynamic agents: the model owns one
+        # NumPy column per attribute and each Resident holds a slot index
+        # into them, so per-step math can operate on whole columns at once.
+        # Residents are only ever created at init or as immigrants, so the
+        # required capacity is known up front.
+        capacity = num_agents + immigrant_count
+        self.resident_slots_used = 0
+        self.resident_by_slot = [None] * capacity
+        self.res_income = np.zeros(capacity)
+        self.res_threshold = np.zeros(capacity)
+        self.res_utility = np.zeros(capacity)
+        self.res_cur_quality = np.zeros(capacity)  # Quality of the currently occupied cell
+        self.res_last_utility = np.zeros(capacity)
+        self.res_unhappy = np.zeros(capacity, dtype=bool)
+        self.res_active = np.zeros(capacity, dtype=bool)
+        self.res_is_immigrant = np.zeros(capacity, dtype=bool)
+        self.res_x = np.zeros(capacity, dtype=np.intp)
+        self.res_y = np.zeros(capacity, dtype=np.intp)
+
+        # Step 0a: Initialize houses on every grid. The bound next_id is
+        # hoisted out of the creation loops; one attribute lookup instead of
+        # one per agent across the width*height+num_agents creations
+        next_id = self.next_id
         for x in range(width):
             for y in range(height):
                 locational_quality = 0
-                house = House(self.next_id(), self, locational_quality)
+                house = House(next_id(), self, locational_quality)
                 self.grid.place_agent(house, (x, y))
                 self.schedule.add(house)
 
         # Step 0b: Initialize agents on the grid.
-        # Initialize agents randomly based on density
-        placed = 0
-        max_attempts = total_cells * 2  # Limit the number of placement attempts to avoid infinite loop
-        attempts = 0
-        while placed < num_agents and attempts < max_attempts:
-            x = self.random.randrange(width)
-            y = self.random.randrange(height)
-            print(f"Trying to place agent at: x={x}, y={y}")  # Print the random positions for debugging
-
-            cell_contents = self.grid.get_cell_list_contents((x, y))
-            has_resident = any(isinstance(agent, Resident) for agent in cell_contents)
-
-            if not has_resident:
-                resident_income_mean = 30000 + (self.income_variance * 15000)  # Adjust mean income for residents
-                income = np.random.lognormal(mean=np.log(resident_income_mean), sigma=0.25, size=1)[0]
-                threshold = np.random.beta(a=2.5, b=2.5, size=1)[0] * 0.2 + 0.3
-                agent = Resident(self.next_id(), self, threshold, income)
-                self.grid.place_agent(agent, (x, y))
-                self.schedule.add(agent)
-                placed += 1
-            attempts += 1
-        print(placed)
-        if placed < num_agents:
-            print(f"Only placed {placed} agents out of {num_agents} due to density constraints.")
+        # Initialize agents randomly based on density: every cell is empty at
+        # this point, so shuffling the cell list and taking the first
+        # num_agents entries replaces the old sample-and-reject loop, whose
+        # rejection tail grew with density
+        cells = [(x, y) for x in range(width) for y in range(height)]
+        self.random.shuffle(cells)
+        for placed in range(num_agents):
+            income = self._resident_incomes[placed]
+            threshold = self._resident_thresholds[placed]
+            agent = Resident(next_id(), self, threshold, income)
+            self.grid.place_agent(agent, cells[placed])
+            self.schedule.add(agent)
+
+        self.refresh_neighbor_grids()
 
     def step(self):
         # Add immigrants gradually each step after immigrant_start
         if self.current_step >= self.immigrant_start and self.immigrants_added < self.immigrant_count:
             self.add_immigrants(1)  # Add 1 immigrant per step after immigrant_start
         self.schedule.step()
+        self._recompute_stats()
         self.datacollector.collect(self)
         self.current_step += 1
 
@@ -76,103 +169,374 @@ class Gentrification(mesa.Model):
         # Function to add a specified number of immigrants
         for _ in range(number):
             if self.immigrants_added < self.immigrant_count:
-                immigrant_income_mean = 30000 - (self.income_variance * 15000)  # Adjust mean income for immigrants
-                income = np.random.lognormal(mean=np.log(immigrant_income_mean), sigma=0.25, size=1)[0]
-                threshold = np.random.beta(a=2.0, b=3.0, size=1)[0] * 0.2 + 0.3
+                income = self._immigrant_incomes[self.immigrants_added]
+                threshold = self._immigrant_thresholds[self.immigrants_added]
                 immigrant = Immigrant(self.next_id(), self, threshold, income)
                 x, y = self.random_empty_cell()
                 self.grid.place_agent(immigrant, (x, y))
                 self.schedule.add(immigrant)
                 self.immigrants_added += 1
 
-    def random_empty_cell(self):
-        while True:
-            x = self.random.randrange(self.grid.width)
-            y = self.random.randrange(self.grid.height)
-            print(f"Trying to place immigrant at: x={x}, y={y}")  # Print the random positions for debugging
+    def register_resident(self, agent):
+        """
+        Claim a structure-of-arrays slot for a newly created dynamic agent.
+
+        Args:
+            agent: The Resident (or Immigrant) being created.
+
+        Returns:
+            The slot index assigned to the agent.
+        """
+        slot = self.resident_slots_used
+        self.resident_slots_used += 1
+        self.resident_by_slot[slot] = agent
+        self.res_active[slot] = True
+        self.res_is_immigrant[slot] = agent.is_immigrant
+        return slot
+
+    def compute_utilities(self, agents):
+        """
+        Batch-compute the utility of every agent that is about to step with
+        one NumPy expression over the structure-of-arrays columns, instead
+        of a per-agent calculate_utilities call.
+        """
+        if not agents:
+            return
+        slots = np.fromiter((agent._slot for agent in agents), dtype=np.intp, count=len(agents))
+        x = self.res_x[slots]
+        y = self.res_y[slots]
+        quality = self.locational_quality_grid[x, y]
+        # decide_to_move reuses the same quality right after this
+        self.res_cur_quality[slots] = quality
 
-            cell_contents = self.grid.get_cell_list_contents((x, y))
-            has_resident = any(isinstance(agent, Resident) for agent in cell_contents)
+        # Scale locational quality between 0 and 1
+        max_quality = self.max_locational_quality
+        if max_quality > 0:
+            capped_quality = quality / max_quality
+        else:
+            capped_quality = np.zeros_like(quality)
 
-            if not has_resident:
-                return (x, y)
+        # In-group influence from the per-type neighbor-count grids
+        resident_neighbors = self.resident_neighbor_grid[x, y]
+        immigrant_neighbors = self.immigrant_neighbor_grid[x, y]
+        in_group = np.where(self.res_is_immigrant[slots], immigrant_neighbors, resident_neighbors)
+        total_neighbors = 8 + resident_neighbors + immigrant_neighbors
+        in_group_influence = in_group / total_neighbors
+
+        self.res_utility[slots] = (self.preference * capped_quality
+                                   + self.one_minus_preference * in_group_influence)
+
+    def apply_happiness_update(self, agents):
+        """
+        Vectorized replacement for the old per-agent update_happiness:
+        nudge the happiness threshold of every stepped agent toward or away
+        from 1 depending on how its utility changed, record the utility as
+        last_utility, and refresh the unhappiness flags.
+        """
+        agents = [agent for agent in agents if self.res_active[agent._slot]]
+        if not agents:
+            return
+        slots = np.fromiter((agent._slot for agent in agents), dtype=np.intp, count=len(agents))
+        moved = np.fromiter((agent.moved_this_step for agent in agents), dtype=bool, count=len(agents))
+        utility = self.res_utility[slots]
+        last_utility = self.res_last_utility[slots]
+        threshold = self.res_threshold[slots]
+        # Branchless form of the old +/- 0.15 * (1 - threshold) adjustment:
+        # the sign of the utility change picks the direction
+        threshold = threshold + np.sign(utility - last_utility) * 0.15 * (1 - threshold)
+        self.res_threshold[slots] = threshold
+        self.res_last_utility[slots] = utility
+        # Residents whose move attempt failed (or was unnecessary) already
+        # set their unhappiness flag in decide_to_move; movers and all
+        # immigrants are re-evaluated against the updated threshold
+        refresh = moved | self.res_is_immigrant[slots]
+        self.res_unhappy[slots[refresh]] = (utility < threshold)[refresh]
+
+    def refresh_neighbor_grids(self):
+        """
+        Rebuild the per-type neighbor-count grids with one set of rolled
+        sums instead of per-agent get_neighbors calls.
+        """
+        self.resident_neighbor_grid = self._neighbor_total(self.resident_count_grid)
+        self.immigrant_neighbor_grid = self._neighbor_total(self.immigrant_count_grid)
+
+    def _neighbor_total(self, count_grid):
+        # Toroidal Moore-neighborhood sum, matching grid.get_neighbors
+        total = np.zeros_like(count_grid)
+        for dx, dy in MOORE_OFFSETS:
+            total += np.roll(count_grid, (dx, dy), axis=(0, 1))
+        return total
+
+    def _shift_neighbor_counts(self, pos, delta, neighbor_grid):
+        # Incremental update of a neighbor-count grid around one cell, used
+        # when an agent moves mid-step so later agents see live counts.
+        # The precomputed wrap table makes this one fancy-indexed add; the
+        # 8 neighbor cells are distinct on any grid at least 3 cells wide
+        x, y = pos
+        neighbor_grid[self._moore_xi[x, y], self._moore_yi[x, y]] += delta
+
+    def _grids_for(self, agent):
+        # Count/neighbor grid pair matching the agent's group
+        if agent.is_immigrant:
+            return self.immigrant_count_grid, self.immigrant_neighbor_grid
+        return self.resident_count_grid, self.resident_neighbor_grid
+
+    def update_locational_qualities(self):
+        """
+        Recompute every house's locational quality in one vectorized pass.
+        A toroidal 3x3 neighbor sum over the income grid replaces the
+        per-house get_neighbors call that House.step used to make.
+        Assumes refresh_neighbor_grids has already run this step: the
+        per-type neighbor counts double as the divisor, so the occupancy
+        rolls are not repeated here.
+        """
+        income_sum = np.zeros_like(self.income_grid)
+        for dx, dy in MOORE_OFFSETS:
+            income_sum += np.roll(self.income_grid, (dx, dy), axis=(0, 1))
+        resident_count = (self.resident_neighbor_grid
+                          + self.immigrant_neighbor_grid).astype(self.income_grid.dtype)
+        # Houses with no neighboring residents keep their previous quality
+        new_quality = np.divide(income_sum, resident_count,
+                                out=self.locational_quality_grid.copy(),
+                                where=resident_count > 0)
+        self.locational_quality_grid = np.where(self.house_mask, new_quality,
+                                                self.locational_quality_grid)
+        # Qualities only change here, so the per-step maximum used to scale
+        # utilities can be cached alongside the update
+        self.max_locational_quality = float(self.locational_quality_grid.max())
+
+    def vacant_candidate_arrays(self):
+        """
+        Coordinate-array view of the vacancy index, rebuilt only when the
+        set has changed since the last call so that repeated house searches
+        within a step share one conversion.
+        """
+        if self._vacant_arrays is None:
+            vacant = list(self.vacant_house_positions)
+            xs = np.fromiter((pos[0] for pos in vacant), dtype=np.intp, count=len(vacant))
+            ys = np.fromiter((pos[1] for pos in vacant), dtype=np.intp, count=len(vacant))
+            self._vacant_arrays = (vacant, xs, ys)
+        return self._vacant_arrays
+
+    def refresh_move_queue(self, top_n):
+        """
+        Cache the highest-quality vacant houses once per step, sorted by
+        locational quality, so unhappy residents can pick from a shared
+        candidate list instead of each rescanning the entire grid.
+        """
+        if top_n <= 0 or not self.vacant_house_positions:
+            self.move_queue = []
+            return
+        vacant, xs, ys = self.vacant_candidate_arrays()
+        qualities = self.locational_quality_grid[xs, ys]
+        # Only the top_n entries need ordering, so partition first and sort
+        # just that slice instead of the full vacancy list
+        if top_n < qualities.size:
+            top = np.argpartition(-qualities, top_n)[:top_n]
+            order = top[np.argsort(-qualities[top])]
+        else:
+            order = np.argsort(-qualities)
+        height = self.height
+        self.move_queue = [int(xs[i]) * height + int(ys[i]) for i in order]
+
+    def random_empty_cell(self):
+        """
+        Pick a random vacant house from the maintained vacancy index instead
+        of rejection-sampling cells until an unoccupied one turns up.
+        """
+        if not self.vacant_house_positions:
+            raise RuntimeError("No vacant houses left to place an agent on")
+        return self.random.choice(list(self.vacant_house_positions))
     
     def calculate_morans_i(self):
-        # Create a matrix to store the presence of residents and immigrants
-        matrix = np.zeros((self.grid.height, self.grid.width), dtype=int)
-
-        # Populate the matrix
-        for cell in self.grid.coord_iter():
-            cell_content, (x, y) = cell
-            for agent in cell_content:
-                if isinstance(agent, Resident) and not isinstance(agent, Immigrant):
-                    matrix[y, x] = 1
-                elif isinstance(agent, Immigrant):
-                    matrix[y, x] = 2
-
-        # Calculate the weights matrix
-        weights = self.get_weights_matrix()
-
-        # Calculate Moran's I
+        # Nothing on the grid has moved since the last computation, so the
+        # cached statistic is still exact
+        if not self._morans_i_dirty:
+            return self._morans_i_cache
+
+        # Matrix of resident (1) / immigrant (2) presence per cell. The
+        # per-type count mirrors already record exactly what the old
+        # coord_iter walk extracted — including occupants of converted slum
+        # cells, which stay in the grid — so the fill is two transposed
+        # adds in int8 instead of a Python pass over every cell
+        matrix = (self.resident_count_grid
+                  + 2 * self.immigrant_count_grid).T.astype(np.int8)
+
+        # Calculate Moran's I. The spatial lag is a toroidal Moore-stencil
+        # average of the deviations — the same rolled-sum kernel the
+        # neighbor-count grids use — replacing the per-cell weights matrix
+        # (row-standardized Moore weights on a torus are uniformly 1/8) and
+        # the old deviation * deviation.T product, which transposed the
+        # deviation grid instead of spatially lagging it.
         n = matrix.size
-        mean = matrix.mean()
-        deviation = matrix - mean
-        squared_deviation = deviation ** 2
-        weights_sum = np.sum(weights)
-        numerator = np.sum(deviation * deviation.T * weights)
-        denominator = np.sum(squared_deviation) / n
-        morans_i = numerator / (denominator * weights_sum)
+        deviation = matrix - matrix.mean()
+        lag = np.zeros_like(deviation, dtype=float)
+        for dx, dy in MOORE_OFFSETS:
+            lag += np.roll(deviation, (dx, dy), axis=(0, 1))
+        lag /= 8.0
+        numerator = np.sum(deviation * lag)
+        # Row-standardized weights sum to 1 per cell, so the total weight is n
+        denominator = np.sum(deviation ** 2) / n
+        morans_i = numerator / (denominator * n)
 
+        self._morans_i_cache = morans_i
+        self._morans_i_dirty = False
         return morans_i
 
     def get_weights_matrix(self):
-        weights = np.zeros((self.grid.height, self.grid.width))
-        for i in range(self.grid.height):
-            for j in range(self.grid.width):
-                neighbors = self.grid.get_neighbors((i, j), moore=True, include_center=False, radius=1)
-                num_neighbors = len(neighbors)
-                for neighbor in neighbors:
-                    weights[i, j] += 1 / num_neighbors
-        return weights
+        # Position-invariant, so the cached copy built at init is returned
+        # rather than re-querying every cell's neighbors each call
+        return self._weights_matrix
             
+    def _recompute_stats(self):
+        """
+        One pass over the structure-of-arrays columns filling every
+        population statistic the reporters need, instead of each reporter
+        re-reducing the agent lists on its own.
+        """
+        active = self.res_active
+        unhappy = self.res_unhappy & active
+        self._stats = {
+            "avg_income": np.mean(self.res_income[active]) if active.any() else 0,
+            "avg_utility": np.mean(self.res_last_utility[active]) if active.any() else 0,
+            "unhappy_residents": int(np.count_nonzero(unhappy)),
+            "unhappy_immigrants": int(np.count_nonzero(unhappy & self.res_is_immigrant)),
+        }
+
+    def get_average_income(self):
+        return self._stats["avg_income"]
+
     def get_unhappy_agents(self):
-        unhappy_count = sum(1 for agent in self.schedule.agents if isinstance(agent, Resident) and agent.is_unhappy)
-        print(f"Unhappy Residents: {unhappy_count}")  # debug, del later
-        return unhappy_count
+        return self._stats["unhappy_residents"]
 
     def get_unhappy_immigrant(self):
-        unhappy_i_count = sum(1 for agent in self.schedule.agents if isinstance(agent, Immigrant) and agent.is_unhappy)
-        print(f"Unhappy Immigrant: {unhappy_i_count}")  # debug, del later
-        return unhappy_i_count
+        return self._stats["unhappy_immigrants"]
 
     def get_average_utility(self):
-        utilities = [agent.last_utility for agent in self.schedule.agents if isinstance(agent, Resident)]
-        avg_utility = np.mean(utilities) if utilities else 0
-        print(f"Average Utility: {avg_utility}")  # debug, del later
-        return avg_utility
-    
+        return self._stats["avg_utility"]
+
     def count_urban_slums(self):
-        print(f"Number of Urban Slums: {self.slum_count}")
         return self.slum_count
 
+class GentrificationGrid(mesa.space.MultiGrid):
+    """
+    MultiGrid that keeps the model's NumPy mirrors (occupancy, incomes,
+    per-type counts, vacancy index) in sync on every placement, move and
+    removal, so the agent code does not have to update them by hand.
+    """
+
+    def __init__(self, width, height, torus, model):
+        super().__init__(width, height, torus)
+        self.model = model
+
+    def place_agent(self, agent, pos):
+        super().place_agent(agent, pos)
+        model = self.model
+        model._vacant_arrays = None  # Vacancies may change; drop the array view
+        model._morans_i_dirty = True
+        if isinstance(agent, Resident):
+            model.occupied_mask[pos] = True
+            model.income_grid[pos] = agent.income
+            count_grid, neighbor_grid = model._grids_for(agent)
+            count_grid[pos] = 1
+            model._shift_neighbor_counts(pos, 1, neighbor_grid)
+            model.res_x[agent._slot], model.res_y[agent._slot] = pos
+            model.vacant_house_positions.discard(pos)
+        elif isinstance(agent, House):
+            model.house_mask[pos] = True
+            model.house_by_pos[pos] = agent
+            model.locational_quality_grid[pos] = agent.initial_locational_quality
+            if not model.occupied_mask[pos]:
+                model.vacant_house_positions.add(pos)
+        elif isinstance(agent, UrbanSlum):
+            model.house_mask[pos] = False
+            model.locational_quality_grid[pos] = agent.locational_quality
+            model.vacant_house_positions.discard(pos)
+
+    # move_agent needs no override: Mesa implements it as remove_agent
+    # followed by place_agent, which both maintain the mirrors below
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        super().remove_agent(agent)
+        model = self.model
+        model._vacant_arrays = None  # Vacancies may change; drop the array view
+        model._morans_i_dirty = True
+        if isinstance(agent, House):
+            model.house_mask[pos] = False
+            model.house_by_pos.pop(pos, None)
+            model.locational_quality_grid[pos] = 0
+            model.vacant_house_positions.discard(pos)
+        elif isinstance(agent, Resident):
+            model.occupied_mask[pos] = False
+            model.income_grid[pos] = 0
+            count_grid, neighbor_grid = model._grids_for(agent)
+            count_grid[pos] = 0
+            model._shift_neighbor_counts(pos, -1, neighbor_grid)
+            if model.house_mask[pos]:
+                model.vacant_house_positions.add(pos)
+
+
 class CustomScheduler(mesa.time.BaseScheduler):
     """
     A custom scheduler that activates agents based on their income and level of unhappiness.
     """
+
+    def _registries_for(self, agent):
+        # Exact-type dispatch onto the model's typed registries; slums are
+        # never scheduled, so they are registered at the conversion site
+        agent_type = type(agent)
+        if agent_type is House:
+            return (self.model.houses,)
+        if agent_type is Immigrant:
+            return (self.model.residents, self.model.immigrants)
+        if agent_type is Resident:
+            return (self.model.residents,)
+        return ()
+
+    def add(self, agent):
+        super().add(agent)
+        for registry in self._registries_for(agent):
+            registry.append(agent)
+
+    def remove(self, agent):
+        super().remove(agent)
+        for registry in self._registries_for(agent):
+            registry.remove(agent)
+
     def step(self):
-        # List of all agents who are below their happiness threshold
-        agents_with_priority = [(agent.income, agent) for agent in self.agents if isinstance(agent, Resident) and agent.last_utility < agent.happiness_threshold]
-        # Sort agents by income, highest first
-        agents_with_priority.sort(reverse=True, key=lambda x: x[0])
-
-        # Step all House and UrbanSlum agents
-        for agent in self.agents:
-            if isinstance(agent, House) or isinstance(agent, UrbanSlum):
+        # Slots of all agents who are below their happiness threshold,
+        # ordered by income (highest first) with one argsort over the
+        # structure-of-arrays columns instead of a Python tuple sort
+        model = self.model
+        slots = np.flatnonzero(model.res_active
+                               & (model.res_last_utility < model.res_threshold))
+        if slots.size:
+            order = slots[np.argsort(-model.res_income[slots], kind="stable")]
+            stepped_agents = [model.resident_by_slot[slot] for slot in order]
+        else:
+            stepped_agents = []
+
+        # The static-agent phase: qualities and neighbor counts are
+        # recomputed for the whole grid in vectorized passes. Houses and
+        # slums have no per-agent step work left, so they are not iterated
+        self.model.refresh_neighbor_grids()
+        self.model.update_locational_qualities()
+
+        # On quiescent ticks nobody is below threshold, so the move-queue
+        # rebuild and the batched utility/happiness passes are skipped whole
+        if stepped_agents:
+            # Houses have updated their qualities, so rebuild the shared list
+            # of the best vacant cells before any resident starts looking
+            self.model.refresh_move_queue(len(stepped_agents))
+
+            # Batch-evaluate utilities for everyone about to step, activate
+            # each agent in sorted order, then apply one vectorized
+            # happiness update
+            self.model.compute_utilities(stepped_agents)
+            for agent in stepped_agents:
                 agent.step()
-        
-        # Activate each agent in sorted order
-        for _, agent in agents_with_priority:
-            agent.step()
+            self.model.apply_happiness_update(stepped_agents)
 
         self.steps += 1
         self.time += 1
\ No newline at end of file
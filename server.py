@@ -5,32 +5,39 @@ from mesa.visualization.modules import ChartModule
 from model import Gentrification
 from agents import Resident, Immigrant, UrbanSlum, House
 
+# Portrayals are fixed per agent type (and move flag), so build each dict
+# once at import; agent_portrayal hands out copies because CanvasGrid.render
+# writes the cell coordinates into whatever it gets back
+_BASE_PORTRAYAL = {"Shape": "rect", "Filled": "true", "Layer": 0, "w": 1, "h": 1}
+_RESIDENT_MOVED = {**_BASE_PORTRAYAL, "Color": "cyan", "Layer": 1}  # Color for agents that moved this step
+_RESIDENT_STAYED = {**_BASE_PORTRAYAL, "Color": "green", "Layer": 1}
+_IMMIGRANT_MOVED = {**_BASE_PORTRAYAL, "Color": "magenta", "Layer": 1}  # Color for immigrants that moved this step
+_IMMIGRANT_STAYED = {**_BASE_PORTRAYAL, "Color": "red", "Layer": 1}
+_SLUM_PORTRAYAL = {**_BASE_PORTRAYAL, "Color": "black", "Layer": 2}  # Draw slums below agents if desired
+_HOUSE_PORTRAYAL = {**_BASE_PORTRAYAL, "Color": "gray", "Layer": 0}
+
+# Dispatch on exact type instead of an isinstance ladder; dynamic agents map
+# to a (moved, stayed) pair selected by their move flag
+_STATIC_PORTRAYALS = {House: _HOUSE_PORTRAYAL, UrbanSlum: _SLUM_PORTRAYAL}
+_MOVER_PORTRAYALS = {
+    Resident: (_RESIDENT_MOVED, _RESIDENT_STAYED),
+    Immigrant: (_IMMIGRANT_MOVED, _IMMIGRANT_STAYED),
+}
+
+
 def agent_portrayal(agent):
     if agent is None:
-        return
-    
-    portrayal = {"Shape": "rect", "Filled": "true", "Layer": 0, "w": 1, "h": 1}
-    
-    if isinstance(agent, Resident) and not isinstance(agent, Immigrant):
-        if agent.moved_this_step:
-            portrayal["Color"] = "cyan"  # Color for agents that moved this step
-        else:
-            portrayal["Color"] = "green"
-        portrayal["Layer"] = 1
-    elif isinstance(agent, Immigrant):
-        if agent.moved_this_step:
-            portrayal["Color"] = "magenta"  # Color for immigrants that moved this step
-        else:
-            portrayal["Color"] = "red"
-        portrayal["Layer"] = 1
-    elif isinstance(agent, UrbanSlum):
-        portrayal["Color"] = "black"
-        portrayal["Layer"] = 2  # Draw slums below agents if desired
-    elif isinstance(agent, House):
-        portrayal["Color"] = "gray"
-        portrayal["Layer"] = 0
-    
-    return portrayal
+        return None
+
+    agent_type = type(agent)
+    portrayal = _STATIC_PORTRAYALS.get(agent_type)
+    if portrayal is None:
+        pair = _MOVER_PORTRAYALS.get(agent_type)
+        if pair is None:
+            return None
+        portrayal = pair[0] if agent.moved_this_step else pair[1]
+
+    return portrayal.copy()
 
 # Set up the canvas
 grid = CanvasGrid(